@@ -3,7 +3,7 @@ Functions for creating arxiv dataset
 """
 import json
 import pandas as pd
-from sklearn.model_selection import train_test_split
+from core.data.sampling import train_test_indices
 
 ID_KEY = "id"
 AUTHORS_KEY = "authors"
@@ -124,21 +124,28 @@ def sample_arxiv_data_by_category(arxiv_df):
     Sample arxiv data, using 80% of data for training.
     Returns tuple of DataFrames
 
+    The split is done on row positions (see core.data.sampling),
+    arxiv_df is never modified.
+
     :param arxiv_df: pandas DataFrame
     :return: Tuple of DataFrames representing train and test data
     """
+    train_idx, test_idx = train_test_indices(arxiv_df["categories"], train_size=0.8)
 
-    sample_train, sample_test = train_test_split(arxiv_df, train_size=0.8,
-                                                random_state=3020211120,
-                                                stratify=arxiv_df["categories"])
+    sample_train = _take_rows(arxiv_df, train_idx)
+    sample_test = _take_rows(arxiv_df, test_idx)
 
-    sample_train['full_df_index'] = sample_train.index
-    sample_test['full_df_index'] = sample_test.index
+    return (sample_train, sample_test)
 
-    sample_train.reset_index(inplace=True,drop=True)
-    sample_test.reset_index(inplace=True,drop=True)
 
-    return (sample_train, sample_test)
+def _take_rows(arxiv_df, positions):
+    """
+    Rows of arxiv_df at positions with a fresh index,
+    the original index is kept in column full_df_index
+    """
+    rows = arxiv_df.take(positions)
+    rows = rows.assign(full_df_index=rows.index)
+    return rows.reset_index(drop=True)
 
 
 # from https://www.kaggle.com/artgor/arxiv-metadata-exploration
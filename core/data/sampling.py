@@ -0,0 +1,195 @@
+"""
+Index based sampling of the arxiv data for fast exploratory fits
+
+Everything here works on row indices rather than DataFrame copies.
+The stratified order puts rows in a sequence where every prefix is a
+stratified sample, so nested subsamples (1%, 5%, 20%, ...) of a CSR
+matrix whose rows follow that order are zero-copy prefix views.
+"""
+import json
+import numpy as np
+import scipy.sparse as sp
+from sklearn.model_selection import train_test_split
+
+SAMPLE_SEED = 3020211120
+SAMPLE_FRACTIONS = (0.01, 0.05, 0.2)
+
+
+def train_test_indices(labels, train_size=0.8, random_state=SAMPLE_SEED):
+    """
+    Stratified train/test split returning row positions only
+
+    Gives the same split as train_test_split on the DataFrame itself.
+
+    :param labels: array-like of stratum labels, e.g. arxiv_df["categories"]
+    :param train_size: (float) fraction of rows used for training
+    :param random_state: (int) seed
+    :return: tuple of numpy.ndarray (train positions, test positions)
+    """
+    positions = np.arange(len(labels))
+    return train_test_split(positions, train_size=train_size,
+                            random_state=random_state,
+                            stratify=labels)
+
+
+def stratified_sample_order(labels, seed=SAMPLE_SEED):
+    """
+    Permutation of row positions where every prefix is stratified
+
+    Rows of each stratum are shuffled, then the strata are interleaved
+    by spreading the r-th row of a stratum of size n_s at (r + u) / n_s,
+    u uniform in [0, 1). Any prefix of length n then holds close to
+    n * n_s / N rows of each stratum, and prefixes are nested.
+
+    :param labels: array-like of stratum labels
+    :param seed: (int) seed, the same seed always gives the same order
+    :return: numpy.ndarray of row positions
+    """
+    rng = np.random.RandomState(seed)
+    _, strata = np.unique(np.asarray(labels), return_inverse=True)
+
+    # one stable sort groups the positions of every stratum, in increasing order
+    grouped = np.argsort(strata, kind='stable')
+    bounds = np.cumsum(np.bincount(strata))[:-1]
+
+    keys = np.empty(len(strata))
+    for positions in np.split(grouped, bounds):
+        rng.shuffle(positions)
+        ranks = np.arange(len(positions))
+        keys[positions] = (ranks + rng.uniform(size=len(positions))) / len(positions)
+
+    return np.argsort(keys, kind='stable')
+
+
+def nested_sample_sizes(n_rows, fractions=SAMPLE_FRACTIONS):
+    """
+    Number of rows in each nested subsample
+
+    :param n_rows: (int) number of rows in the full data
+    :param fractions: iterable of (float) fractions
+    :return: dict with key (float) fraction, value (int) number of rows
+    """
+    return {frac: max(1, int(round(frac * n_rows))) for frac in fractions}
+
+
+def nested_stratified_samples(labels, fractions=SAMPLE_FRACTIONS, seed=SAMPLE_SEED):
+    """
+    Nested stratified subsamples as row positions into the full data
+
+    Every sample is a prefix (a view, not a copy) of the same
+    stratified order, so the 1% sample is contained in the 5% sample, etc.
+
+    :param labels: array-like of stratum labels
+    :param fractions: iterable of (float) fractions
+    :param seed: (int) seed
+    :return: dict with key (float) fraction, value numpy.ndarray of positions
+    """
+    order = stratified_sample_order(labels, seed=seed)
+    sizes = nested_sample_sizes(len(order), fractions)
+    return {frac: order[:size] for frac, size in sizes.items()}
+
+
+def csr_prefix_view(csr_matrix, n_rows):
+    """
+    First n_rows rows of a CSR matrix, sharing data with the original
+
+    scipy's csr_matrix[:n] copies data and indices, this does not.
+
+    :param csr_matrix: scipy.sparse.csr_matrix
+    :param n_rows: (int) number of leading rows
+    :return: scipy.sparse.csr_matrix view
+    """
+    if not (sp.issparse(csr_matrix) and csr_matrix.format == 'csr'):
+        raise TypeError(f"Expected a CSR matrix, got {type(csr_matrix).__name__}")
+    nnz = csr_matrix.indptr[n_rows]
+    # assigning the arrays directly skips the constructor's pruning,
+    # which copies slices that are much smaller than their base array
+    view = sp.csr_matrix((n_rows, csr_matrix.shape[1]), dtype=csr_matrix.dtype)
+    view.data = csr_matrix.data[:nnz]
+    view.indices = csr_matrix.indices[:nnz]
+    view.indptr = csr_matrix.indptr[:n_rows + 1]
+    return view
+
+
+def nested_csr_samples(csr_matrix, labels, fractions=SAMPLE_FRACTIONS, seed=SAMPLE_SEED):
+    """
+    Reorder the rows of csr_matrix once into stratified order, and
+    return every nested subsample as a zero-copy prefix view of it
+
+    :param csr_matrix: scipy.sparse.csr_matrix, e.g. tf-idf train matrix
+    :param labels: array-like of stratum labels, one per row
+    :param fractions: iterable of (float) fractions
+    :param seed: (int) seed
+    :return ordered_matrix: csr_matrix with rows in stratified order
+    :return order: numpy.ndarray, row i of ordered_matrix is row order[i]
+                    of csr_matrix
+    :return samples: dict with key (float) fraction, value csr_matrix view
+    """
+    order = stratified_sample_order(labels, seed=seed)
+    ordered_matrix = csr_matrix[order]
+    sizes = nested_sample_sizes(len(order), fractions)
+    samples = {frac: csr_prefix_view(ordered_matrix, size)
+               for frac, size in sizes.items()}
+    return ordered_matrix, order, samples
+
+
+def reservoir_sample(stream, sample_size, seed=SAMPLE_SEED):
+    """
+    Uniform sample of sample_size items from a stream of unknown length
+    in a single pass (reservoir sampling, Li's algorithm L)
+
+    :param stream: iterable
+    :param sample_size: (int) number of items to keep
+    :param seed: (int) seed
+    :return: list of (position in stream, item), sorted by position
+    """
+    if sample_size <= 0:
+        return []
+    rng = np.random.RandomState(seed)
+    reservoir = []
+    iterator = enumerate(stream)
+
+    for position, item in iterator:
+        reservoir.append((position, item))
+        if len(reservoir) == sample_size:
+            break
+
+    w = np.exp(np.log(rng.uniform()) / sample_size)
+    next_position = sample_size - 1 + int(np.floor(np.log(rng.uniform()) / np.log(1 - w))) + 1
+    for position, item in iterator:
+        if position < next_position:
+            continue
+        reservoir[rng.randint(sample_size)] = (position, item)
+        w *= np.exp(np.log(rng.uniform()) / sample_size)
+        next_position = position + int(np.floor(np.log(rng.uniform()) / np.log(1 - w))) + 1
+
+    return sorted(reservoir, key=lambda entry: entry[0])
+
+
+def reservoir_sample_arxiv(input_path, sample_size, seed=SAMPLE_SEED):
+    """
+    Uniform sample of articles from the full arxiv dump in a single pass
+    Only the sampled lines are parsed as json.
+
+    :param input_path: path to full arxiv data (as string)
+    :param sample_size: (int) number of articles
+    :param seed: (int) seed
+    :return: list of dict where each dict represents an article
+    """
+    with open(input_path, 'r') as f:
+        sampled_lines = reservoir_sample(f, sample_size, seed=seed)
+    return [json.loads(line) for _, line in sampled_lines]
+
+
+def extrapolate_runtime(sample_rows, sample_secs, full_rows):
+    """
+    Fit secs = c * rows^p on runs over nested subsamples
+    and extrapolate to the full data
+
+    :param sample_rows: iterable of (int) rows in each subsample
+    :param sample_secs: iterable of (float) measured time for each subsample
+    :param full_rows: (int) rows in the full data
+    :return: tuple (predicted secs for full_rows, exponent p)
+    """
+    exponent, log_c = np.polyfit(np.log(sample_rows), np.log(sample_secs), 1)
+    return float(np.exp(log_c) * full_rows ** exponent), float(exponent)
@@ -0,0 +1,63 @@
+"""
+gensim compatible views of a term count CSR matrix
+
+Lets gensim (e.g. CoherenceModel) use the count matrix and vocabulary
+from core.data.text.tf_idf_helpers.fit_transform_tfidf_with_counts
+directly, so term ids are the tf-idf column indices and no list of
+bag-of-words lists is kept in memory.
+"""
+import numpy as np
+from gensim.corpora import Dictionary
+
+
+class CSRCorpus:
+    """
+    Streamed gensim corpus over the rows of a count CSR matrix
+
+    Each document is yielded as a list of (term id, count) tuples,
+    the same form as gensim.corpora.Dictionary.doc2bow returns.
+    """
+
+    def __init__(self, count_matrix):
+        self.count_matrix = count_matrix.tocsr()
+        self.count_matrix.sort_indices()
+
+    def __len__(self):
+        return self.count_matrix.shape[0]
+
+    def __getitem__(self, doc_index):
+        start = self.count_matrix.indptr[doc_index]
+        end = self.count_matrix.indptr[doc_index + 1]
+        return list(zip(self.count_matrix.indices[start:end].tolist(),
+                        self.count_matrix.data[start:end].astype(int).tolist()))
+
+    def __iter__(self):
+        for doc_index in range(len(self)):
+            yield self[doc_index]
+
+
+def csr_dictionary(count_matrix, index_to_word):
+    """
+    gensim Dictionary whose ids are the columns of count_matrix
+
+    Document and collection frequencies are read off the CSR matrix
+    instead of re-scanning the tokens.
+
+    :param count_matrix: scipy.sparse matrix of term counts, docs x terms
+    :param index_to_word: dict mapping column indices to tokens
+    :return: gensim.corpora.Dictionary
+    """
+    count_matrix = count_matrix.tocsr()
+    n_terms = count_matrix.shape[1]
+    dfs = np.bincount(count_matrix.indices, minlength=n_terms)
+    cfs = np.asarray(count_matrix.sum(axis=0)).ravel().astype(int)
+
+    dictionary = Dictionary()
+    dictionary.token2id = {word: index for index, word in index_to_word.items()}
+    dictionary.id2token = dict(index_to_word)
+    dictionary.dfs = dict(enumerate(dfs.tolist()))
+    dictionary.cfs = dict(enumerate(cfs.tolist()))
+    dictionary.num_docs = count_matrix.shape[0]
+    dictionary.num_pos = int(cfs.sum())
+    dictionary.num_nnz = int(count_matrix.nnz)
+    return dictionary
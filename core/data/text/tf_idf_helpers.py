@@ -4,7 +4,8 @@ Functions for training and applying TF-IDF vectorizer
 import pandas as pd
 import scipy.sparse as sp
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import (CountVectorizer, TfidfTransformer,
+                                             TfidfVectorizer)
 
 # See documentation for scipy CSR sparse matrices
 # https://docs.scipy.org/doc/scipy/reference/generated/scipy.sparse.csr_matrix.html#scipy.sparse.csr_matrix
@@ -64,3 +65,39 @@ def transform_tfidf(input_df,
     tfidf_matrix = tfidf_obj.transform(input_df[token_col_name])
 
     return tfidf_matrix, index_to_doc_id
+
+
+def fit_transform_tfidf_with_counts(input_df,
+                                    token_col_name='tokens',
+                                    doc_id_col_name='id',
+                                    dummy=dummy_tokenizer):
+    """
+    Function to compute the term count matrix and the tfidf matrix of a
+    corpora in a single pass, sharing one vocabulary
+
+    Gives the same tfidf matrix and index_to_word as fit_tfidf followed
+    by transform_tfidf. The count matrix holds raw term counts with the
+    same column indices, see core.data.text.bow_corpus for using it
+    with gensim.
+
+    :param input_df: pandas DataFrame containing corpora
+    :param token_col_name: str name of the col containing tokens in input_df
+    :param doc_id_col_name: str name of the col containing doc id in input_df
+    :return count_matrix: CSR matrix of term counts
+    :return tfidf_matrix: CSR tfidf matrix
+    :return index_to_word: dict mapping column indices to tokens
+    :return index_to_doc_id: dict mapping row indices to doc_ids
+                                from input_df
+    """
+    counter = CountVectorizer(analyzer='word',
+                              tokenizer=dummy,
+                              preprocessor=dummy,
+                              token_pattern=None)
+    count_matrix = counter.fit_transform(input_df[token_col_name])
+    tfidf_matrix = TfidfTransformer().fit_transform(count_matrix)
+
+    index_to_word = {index:word for word,index in counter.vocabulary_.items()}
+    index_to_doc_id = {index:doc_id for
+                       index,doc_id in input_df[doc_id_col_name].items()}
+
+    return count_matrix, tfidf_matrix, index_to_word, index_to_doc_id
@@ -1,9 +1,9 @@
 """
 Wrapper for sampling data, computing idf, storing related matrices
 """
-import gensim.corpora as corpora
 from core.data.arxiv_data_io import *
 from core.data.text.tf_idf_helpers import *
+from core.data.text.bow_corpus import CSRCorpus, csr_dictionary
 from gensim.models.coherencemodel import CoherenceModel
 
 
@@ -16,27 +16,48 @@ class TrainingData:
         self.data_df = pd.read_pickle(path_to_pkl_data)
         self.train_df, _ = sample_arxiv_data_by_category(self.data_df)
 
-        # compute tf-idf matrix on train tokens
+        # compute count and tf-idf matrices on train tokens, one shared vocabulary
         self.tokens = self.train_df['tokens']
-        tfidf_obj, self.index_to_word = fit_tfidf(self.train_df['tokens'])
-        self.tfidf_train_matrix, self.index_to_doc = transform_tfidf(self.train_df, tfidf_obj=tfidf_obj)
+        (self.count_train_matrix, self.tfidf_train_matrix,
+         self.index_to_word, self.index_to_doc) = fit_transform_tfidf_with_counts(self.train_df)
 
         # data for computing coherence on topics model
+        # id2word ids are the tf-idf column indices of index_to_word
         self.input_data = self.train_df['tokens'].tolist()
-        self.id2word = corpora.Dictionary(self.input_data)
-        self.corpus = [self.id2word.doc2bow(text) for text in self.input_data]
+        self.id2word = csr_dictionary(self.count_train_matrix, self.index_to_word)
+        self.corpus = CSRCorpus(self.count_train_matrix)
 
-    def compute_coherence(self, topic_list):
+    def compute_coherence(self, topic_list, processes=-1):
         """
         Return coherence for topic model trained on self.train_df
 
         ONLY FOR TOPIC MODELING OF THIS DATA SET
         THIS COMPUTATION CAN BE EXTREMELY SLOW
 
-        :param topic_list: list of list of terms
+        :param topic_list: list of list of terms, or of tf-idf column indices
+        :param processes: (int) gensim worker processes, def = -1 (all cores but one)
         :return: (float) coherence
         """
 
-        cm = CoherenceModel(topics=topic_list, texts=self.input_data, corpus=self.corpus,
-                            dictionary=self.id2word, coherence='c_v')
-        return cm.get_coherence()
+        return compute_c_v_coherence(topic_list, self.input_data, self.id2word,
+                                     corpus=self.corpus, processes=processes)
+
+
+def compute_c_v_coherence(topic_list, texts, dictionary, corpus=None, processes=-1):
+    """
+    c_v coherence of topic_list on texts
+
+    Module level so it can run in a worker process with only the texts
+    and dictionary sent over, see core.util.job_scheduler.coherence_job
+
+    :param topic_list: list of list of terms, or of dictionary ids
+    :param texts: list of list of tokens
+    :param dictionary: gensim Dictionary
+    :param corpus: gensim corpus, optional (c_v only needs texts)
+    :param processes: (int) gensim worker processes, def = -1 (all cores but one)
+    :return: (float) coherence
+    """
+    cm = CoherenceModel(topics=topic_list, texts=texts, corpus=corpus,
+                        dictionary=dictionary, coherence='c_v',
+                        processes=processes)
+    return cm.get_coherence()
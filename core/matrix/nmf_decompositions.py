@@ -1,22 +1,50 @@
 import os
+import warnings
 from time import time
 import numpy as np
 import pandas as pd
 import scipy.sparse as sp
 import seaborn as sns
 import matplotlib.pyplot as plt
-from sklearn.decomposition import NMF
+from sklearn.exceptions import ConvergenceWarning
+from core.matrix.nmf_solvers import (NMFInitCache, initialize_nmf,
+                                     build_nmf_solver, frobenius_error,
+                                     squared_frobenius_norm)
 
 
-def nmf_k_helper(input_matrix, kval,write_model_to_file=False):
+def fit_nmf(input_matrix, k, init='nndsvd', solver='cd', max_iter=1000,
+            tol=1e-4, beta_loss='frobenius', init_cache=None):
+    """
+    Fit NMF with a pluggable init and solver, see core.matrix.nmf_solvers
+    The (sparse) input matrix is passed through without densification.
+
+    :param input_matrix: scipy.sparse matrix to factor
+    :param k: (int) number of components
+    :param init: (str) 'nndsvd', 'nndsvda', 'cached' or 'random'
+    :param solver: (str) 'cd', 'mu' or 'hals'
+    :param max_iter: (int) maximum number of iterations
+    :param tol: (float) tolerance of the stopping condition
+    :param beta_loss: (str) loss for solver='mu', def = 'frobenius'
+    :param init_cache: NMFInitCache, shared across calls with init='cached'
+    :return: nmf_model, W, H
+    """
+    W0, H0 = initialize_nmf(input_matrix, k, init=init, init_cache=init_cache)
+    nmf_model = build_nmf_solver(k, solver=solver, max_iter=max_iter,
+                                 tol=tol, beta_loss=beta_loss)
+    W = nmf_model.fit_transform(input_matrix, W=W0, H=H0)
+    H = nmf_model.components_
+
+    return nmf_model, W, H
+
+
+def nmf_k_helper(input_matrix, kval, write_model_to_file=False,
+                 init='nndsvd', solver='cd', init_cache=None):
     """
     helper function for nmf_k search
     """
     t0=time()
-    nmf_model = NMF(n_components=kval, init='nndsvd',
-                    max_iter=100000,random_state=1)
-    W = nmf_model.fit_transform(input_matrix)
-    H = nmf_model.components_
+    nmf_model, W, H = fit_nmf(input_matrix, kval, init=init, solver=solver,
+                              max_iter=100000, init_cache=init_cache)
     time_elapsed = time() - t0
 
     entry = [kval, nmf_model.reconstruction_err_,
@@ -25,28 +53,27 @@ def nmf_k_helper(input_matrix, kval,write_model_to_file=False):
     return entry
 
 
-def compute_nmf(k, A):
+def compute_nmf(k, A, init='nndsvd', solver='cd', beta_loss='frobenius',
+                init_cache=None):
     """"
-    A simple wrapper function for sklearn NMF
-    Instantiate NMF then factorize A into W and H
+    A simple wrapper function for NMF
+    Initialize then factorize A into W and H
 
     Input:
-        A: numpy.ndarray, matrix to factor
+        A: numpy.ndarray or scipy.sparse matrix, matrix to factor
         k: (int)
+        init: (str) 'nndsvd', 'nndsvda', 'cached' or 'random'
+        solver: (str) 'cd', 'mu' or 'hals'
+        beta_loss: (str) loss for solver='mu'
+        init_cache: NMFInitCache, reused across calls with init='cached'
 
     Returns:
         nmf_model: NMF model instance
         W: numpy.ndarray
         H: numpy.ndarray
     """
-    nmf_model = NMF(n_components=k,
-                    init='nndsvd',
-                    max_iter=1000,
-                    random_state=1)
-    W = nmf_model.fit_transform(A)
-    H = nmf_model.components_
-
-    return nmf_model, W, H
+    return fit_nmf(A, k, init=init, solver=solver, max_iter=1000,
+                   beta_loss=beta_loss, init_cache=init_cache)
 
 
 def serialize_NMF(W, H, file_name):
@@ -66,21 +93,32 @@ def serialize_NMF(W, H, file_name):
         assert np.array_equal(reloaded,mat)
 
 
-def nmf_k_search(input_matrix, k_vals, serialize=False):
+def nmf_k_search(input_matrix, k_vals, serialize=False,
+                 init='nndsvd', solver='cd'):
     """
     function for searching over different values of k
+    init='cached' computes a single SVD for the largest k
+    and reuses it for every other k, its time is split evenly
+    over the k values so times stay comparable with other inits
     """
-    
+    init_cache = NMFInitCache() if init == 'cached' else None
+    shared_svd_share = 0.0
+    if init_cache is not None:
+        t0 = time()
+        init_cache.get_svd(input_matrix, max(k_vals))
+        shared_svd_secs = time() - t0
+        shared_svd_share = shared_svd_secs / len(k_vals)
+        print(f"Shared SVD for k ={max(k_vals)} took {shared_svd_secs:.2f} secs, "
+              f"charging {shared_svd_share:.2f} secs to each k")
+
     results = []
     for kval in k_vals:
         print(f"Now fitting NMF for k ={kval}...")
         
         t0=time()
-        nmf_model = NMF(n_components=kval, init='nndsvd',
-                        max_iter=1000,random_state=1)
-        W = nmf_model.fit_transform(input_matrix)
-        time_elapsed = time() - t0
-        H = nmf_model.components_
+        nmf_model, W, H = fit_nmf(input_matrix, kval, init=init, solver=solver,
+                                  max_iter=1000, init_cache=init_cache)
+        time_elapsed = time() - t0 + shared_svd_share
 
         if serialize == True:
             filename = f'NMF_{kval}k'
@@ -100,6 +138,121 @@ def nmf_k_search(input_matrix, k_vals, serialize=False):
     return results_df
 
 
+def _nmf_error_trace(input_matrix, k, init, solver, iter_step, max_iter,
+                     init_cache=None, init_overhead=0.0):
+    """
+    Run NMF in chunks of iter_step iterations (warm started from the
+    previous chunk) and record the error after each chunk.
+    Time spent evaluating the error is excluded from the fit time,
+    init_overhead (secs) is added to it, the first entry is the init time.
+
+    :return: list of [fit time (secs), iterations, reconstruction error]
+    """
+    A_sq_norm = squared_frobenius_norm(input_matrix)
+
+    t0 = time()
+    W, H = initialize_nmf(input_matrix, k, init=init, init_cache=init_cache)
+    fit_time = init_overhead + time() - t0
+    trace = [[fit_time, 0, frobenius_error(input_matrix, W, H, A_sq_norm)]]
+
+    n_iter = 0
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', ConvergenceWarning)
+        while n_iter < max_iter:
+            t0 = time()
+            nmf_model = build_nmf_solver(k, solver=solver, max_iter=iter_step, tol=0)
+            W = nmf_model.fit_transform(input_matrix, W=W, H=H)
+            H = nmf_model.components_
+            fit_time += time() - t0
+            n_iter += iter_step
+            trace.append([fit_time, n_iter, frobenius_error(input_matrix, W, H, A_sq_norm)])
+
+    return trace
+
+
+def compare_nmf_solvers(input_matrix, k_vals,
+                        inits=('nndsvd', 'nndsvda', 'cached'),
+                        solvers=('cd', 'mu', 'hals'),
+                        rel_target=0.01, iter_step=10, max_iter=500):
+    """
+    Time-to-target-error comparison of NMF init/solver combinations
+
+    For each k the target error is (1 + rel_target) times the lowest
+    error reached by any combination within max_iter iterations.
+    Times to target include the init: 'cached' runs share one SVD computed
+    up front for max(k_vals), its cost is split evenly over the k_vals,
+    the other inits pay for their own SVD. The time excluding the init
+    is reported too, fastest_nmf_combinations ranks on the full time.
+    Combinations that never reach the target have NaN times.
+
+    :param input_matrix: scipy.sparse matrix, e.g. tf-idf train matrix
+    :param k_vals: iterable of (int) number of components
+    :param inits: iterable of init names, see core.matrix.nmf_solvers
+    :param solvers: iterable of solver names, see core.matrix.nmf_solvers
+    :param rel_target: (float) relative gap to the best error, def = 0.01
+    :param iter_step: (int) iterations between error evaluations
+    :param max_iter: (int) iteration budget per combination
+    :return: pd.DataFrame with one row per (k, init, solver)
+    """
+    init_cache = None
+    shared_svd_share = 0.0
+    if 'cached' in inits:
+        t0 = time()
+        init_cache = NMFInitCache()
+        init_cache.get_svd(input_matrix, max(k_vals))
+        shared_svd_secs = time() - t0
+        shared_svd_share = shared_svd_secs / len(k_vals)
+        print(f"Shared SVD for k ={max(k_vals)} took {shared_svd_secs:.2f} secs, "
+              f"charging {shared_svd_share:.2f} secs to each k")
+
+    results = []
+    for kval in k_vals:
+        traces = {}
+        for init in inits:
+            for solver in solvers:
+                if solver == 'mu' and init in ('nndsvd', 'cached'):
+                    # multiplicative updates cannot move entries away from 0
+                    continue
+                print(f"Now fitting NMF for k ={kval}, init={init}, solver={solver}...")
+                overhead = shared_svd_share if init == 'cached' else 0.0
+                traces[(init, solver)] = _nmf_error_trace(input_matrix, kval, init, solver,
+                                                          iter_step, max_iter, init_cache,
+                                                          init_overhead=overhead)
+
+        target = (1 + rel_target) * min(trace[-1][2] for trace in traces.values())
+        for (init, solver), trace in traces.items():
+            hit = next((point for point in trace if point[2] <= target), None)
+            init_time = trace[0][0]
+            entry = [kval, init, solver, target, init_time,
+                     hit[0] if hit else np.nan,
+                     hit[0] - init_time if hit else np.nan,
+                     hit[1] if hit else np.nan,
+                     trace[-1][2], trace[-1][0]]
+            print(entry)
+            results.append(entry)
+
+    results_df = pd.DataFrame(results, columns=['k', 'init', 'solver', 'Target error',
+                                                'Init time (secs)',
+                                                'Time to target (secs)',
+                                                'Time to target excl. init (secs)',
+                                                'Iterations to target',
+                                                'Final error', 'Total time (secs)'])
+    return results_df
+
+
+def fastest_nmf_combinations(results_df):
+    """
+    Pick the fastest init/solver combination for each k
+    from the output of compare_nmf_solvers, ranked on the
+    time to target including the init
+
+    :param results_df: pd.DataFrame from compare_nmf_solvers
+    :return: pd.DataFrame with one row per k
+    """
+    fastest = results_df.groupby('k')['Time to target (secs)'].idxmin()
+    return results_df.loc[fastest].reset_index(drop=True)
+
+
 def generate_topics_from_NMF(H_matrix, index_to_word, top_n_words=15, print_out=False):
     """
     Create DataFrame where each row represents a "topic" from NMF
@@ -0,0 +1,260 @@
+"""
+Initializations and solvers for NMF on sparse tf-idf matrices
+
+Every solver exposes the same interface as sklearn.decomposition.NMF
+(fit_transform, components_, reconstruction_err_, n_iter_) so the helpers
+in core.matrix.nmf_decompositions can swap them freely.
+The input matrix is never densified: all products with A are
+sparse @ dense products.
+"""
+import numpy as np
+import scipy.sparse as sp
+from sklearn.decomposition import NMF
+from sklearn.utils.extmath import randomized_svd
+
+INIT_OPTIONS = ('nndsvd', 'nndsvda', 'cached', 'random')
+SOLVER_OPTIONS = ('cd', 'mu', 'hals')
+
+
+def squared_frobenius_norm(A):
+    """
+    Squared Frobenius norm of a sparse or dense matrix
+    """
+    if sp.issparse(A):
+        return float(A.multiply(A).sum())
+    return float(np.sum(A * A))
+
+
+def _nndsvd_from_svd(U, sigmas, V_T, average=None):
+    """
+    NNDSVD initialization (Boutsidis & Gallopoulos 2008)
+    from a precomputed truncated SVD in descending order
+
+    :param U: (numpy.ndarray) left singular vectors, n x k
+    :param sigmas: (numpy.ndarray) singular values, descending
+    :param V_T: (numpy.ndarray) right singular vectors, k x m
+    :param average: (float) if given, fill zeros with average (nndsvda)
+    :return: W, H (numpy.ndarray)
+    """
+    k = len(sigmas)
+    W = np.zeros_like(U)
+    H = np.zeros_like(V_T)
+
+    # the leading singular triplet can be chosen non-negative
+    W[:, 0] = np.sqrt(sigmas[0]) * np.abs(U[:, 0])
+    H[0, :] = np.sqrt(sigmas[0]) * np.abs(V_T[0, :])
+
+    for j in range(1, k):
+        x, y = U[:, j], V_T[j, :]
+        x_p, y_p = np.maximum(x, 0), np.maximum(y, 0)
+        x_n, y_n = np.abs(np.minimum(x, 0)), np.abs(np.minimum(y, 0))
+        x_p_nrm, y_p_nrm = np.linalg.norm(x_p), np.linalg.norm(y_p)
+        x_n_nrm, y_n_nrm = np.linalg.norm(x_n), np.linalg.norm(y_n)
+        m_p, m_n = x_p_nrm * y_p_nrm, x_n_nrm * y_n_nrm
+
+        if m_p > m_n:
+            u, v, sigma = x_p / x_p_nrm, y_p / y_p_nrm, m_p
+        else:
+            u, v, sigma = x_n / x_n_nrm, y_n / y_n_nrm, m_n
+
+        lbd = np.sqrt(sigmas[j] * sigma)
+        W[:, j] = lbd * u
+        H[j, :] = lbd * v
+
+    W[W < 1e-6] = 0
+    H[H < 1e-6] = 0
+    if average is not None:
+        W[W == 0] = average
+        H[H == 0] = average
+    return W, H
+
+
+class NMFInitCache:
+    """
+    Cache of the randomized truncated SVD used by nndsvd style inits
+
+    The SVD is computed once for the largest k requested and its leading
+    columns are reused for every smaller k, so a k search over one matrix
+    pays for a single SVD. A cache belongs to exactly one input matrix.
+    """
+
+    def __init__(self, n_iter=4, random_state=1):
+        self.n_iter = n_iter
+        self.random_state = random_state
+        self.shape = None
+        self.U = None
+        self.sigmas = None
+        self.V_T = None
+
+    def get_svd(self, A, k):
+        """
+        Return the rank k truncated SVD of A, computing it only if
+        no SVD of rank >= k is cached
+
+        :param A: scipy.sparse matrix (or numpy.ndarray)
+        :param k: (int) rank
+        :return: U, sigmas, V_T in descending order of singular values
+        """
+        if self.shape is not None and self.shape != A.shape:
+            raise ValueError(f"NMFInitCache was built for a matrix of shape {self.shape}, "
+                             f"got {A.shape}")
+        if self.sigmas is None or len(self.sigmas) < k:
+            self.U, self.sigmas, self.V_T = randomized_svd(A, k,
+                                                           n_iter=self.n_iter,
+                                                           random_state=self.random_state)
+            self.shape = A.shape
+        return self.U[:, :k], self.sigmas[:k], self.V_T[:k, :]
+
+
+def initialize_nmf(A, k, init='nndsvd', init_cache=None, random_state=1):
+    """
+    Compute starting W, H for NMF without densifying A
+
+    :param A: scipy.sparse matrix to factor
+    :param k: (int) number of components
+    :param init: (str) one of INIT_OPTIONS
+        'nndsvd'  - NNDSVD from a randomized SVD
+        'nndsvda' - NNDSVD with zeros filled by the mean of A (better for mu)
+        'cached'  - NNDSVD reusing the SVD held in init_cache
+        'random'  - scaled non-negative random matrices
+    :param init_cache: NMFInitCache, required for init='cached'
+    :param random_state: (int) seed
+    :return: W, H (numpy.ndarray)
+    """
+    if init not in INIT_OPTIONS:
+        raise ValueError(f"Unknown init '{init}', expected one of {INIT_OPTIONS}")
+
+    n, m = A.shape
+    if init == 'random':
+        rng = np.random.RandomState(random_state)
+        scale = np.sqrt(A.mean() / k)
+        W = np.abs(scale * rng.standard_normal((n, k)))
+        H = np.abs(scale * rng.standard_normal((k, m)))
+        return W, H
+
+    if init == 'cached':
+        if init_cache is None:
+            raise ValueError("init='cached' requires an NMFInitCache")
+        U, sigmas, V_T = init_cache.get_svd(A, k)
+    else:
+        U, sigmas, V_T = randomized_svd(A, k, random_state=random_state)
+
+    return _nndsvd_from_svd(U, sigmas, V_T,
+                            average=A.mean() if init == 'nndsvda' else None)
+
+
+def frobenius_error(A, W, H, A_sq_norm=None):
+    """
+    ||A - WH||_F computed without forming WH
+
+    Uses ||A||^2 - 2 tr(W^T A H^T) + tr((W^T W)(H H^T))
+
+    :param A: scipy.sparse matrix
+    :param W: (numpy.ndarray)
+    :param H: (numpy.ndarray)
+    :param A_sq_norm: (float) precomputed ||A||_F^2, optional
+    :return: (float) reconstruction error
+    """
+    if A_sq_norm is None:
+        A_sq_norm = squared_frobenius_norm(A)
+    cross = np.sum(W * (A @ H.T))
+    gram = np.sum((W.T @ W) * (H @ H.T))
+    return np.sqrt(max(A_sq_norm - 2 * cross + gram, 0))
+
+
+class HALSNMF:
+    """
+    Hierarchical alternating least squares NMF (Cichocki & Phan 2009)
+    with the fit_transform interface of sklearn.decomposition.NMF
+
+    Each outer iteration updates the columns of W and then the rows of H
+    one at a time in closed form. A only appears in A @ H.T and A.T @ W,
+    so sparse input stays sparse.
+
+    Stops like sklearn's cd solver: when the L1 norm of the projected
+    gradient falls below tol times its value at the first iteration,
+    so the same tol gives comparable accuracy across solvers.
+    """
+
+    def __init__(self, n_components, max_iter=200, tol=1e-4, eps=1e-10):
+        self.n_components = n_components
+        self.max_iter = max_iter
+        self.tol = tol
+        self.eps = eps
+
+    @staticmethod
+    def _violation(grad, X, lower_bound):
+        """
+        L1 norm of the projected gradient of X, entries at their
+        lower bound only count if the gradient points into the domain
+        """
+        projected = np.where(X <= lower_bound, np.minimum(grad, 0), grad)
+        return np.abs(projected).sum()
+
+    def fit_transform(self, A, W=None, H=None):
+        """
+        Factor A into W, H starting from W, H (required)
+
+        :param A: scipy.sparse matrix to factor
+        :param W: (numpy.ndarray) initial W
+        :param H: (numpy.ndarray) initial H
+        :return: W (numpy.ndarray), H is stored in self.components_
+        """
+        if W is None or H is None:
+            raise ValueError("HALSNMF needs an explicit initial W and H")
+        W = np.array(W, dtype=np.float64)
+        H = np.array(H, dtype=np.float64)
+        A_T = A.T.tocsr() if sp.issparse(A) else A.T
+        A_sq_norm = squared_frobenius_norm(A)
+
+        violation_init = None
+        n_iter = 0
+        for n_iter in range(1, self.max_iter + 1):
+            AHt = A @ H.T
+            HHt = H @ H.T
+            violation = self._violation(W @ HHt - AHt, W, self.eps)
+            for j in range(self.n_components):
+                W[:, j] += (AHt[:, j] - W @ HHt[:, j]) / max(HHt[j, j], self.eps)
+                np.maximum(W[:, j], self.eps, out=W[:, j])
+
+            AtW = A_T @ W
+            WtW = W.T @ W
+            violation += self._violation(WtW @ H - AtW.T, H, 0)
+            for j in range(self.n_components):
+                H[j, :] += (AtW[:, j] - WtW[j, :] @ H) / max(WtW[j, j], self.eps)
+                np.maximum(H[j, :], 0, out=H[j, :])
+
+            if violation_init is None:
+                violation_init = violation
+            if violation_init == 0 or violation / violation_init <= self.tol:
+                break
+
+        self.components_ = H
+        self.n_iter_ = n_iter
+        self.reconstruction_err_ = frobenius_error(A, W, H, A_sq_norm)
+        return W
+
+
+def build_nmf_solver(k, solver='cd', max_iter=1000, tol=1e-4,
+                     beta_loss='frobenius', random_state=1):
+    """
+    Instantiate an NMF solver expecting an explicit (custom) init
+
+    :param k: (int) number of components
+    :param solver: (str) one of SOLVER_OPTIONS
+    :param max_iter: (int) maximum number of iterations
+    :param tol: (float) tolerance of the stopping condition
+    :param beta_loss: (str) loss, anything but 'frobenius' requires 'mu'
+    :param random_state: (int) seed
+    :return: object with the sklearn NMF fit_transform interface
+    """
+    if solver not in SOLVER_OPTIONS:
+        raise ValueError(f"Unknown solver '{solver}', expected one of {SOLVER_OPTIONS}")
+    if beta_loss != 'frobenius' and solver != 'mu':
+        raise ValueError(f"beta_loss='{beta_loss}' is only supported by solver='mu'")
+
+    if solver == 'hals':
+        return HALSNMF(n_components=k, max_iter=max_iter, tol=tol)
+    return NMF(n_components=k, init='custom', solver=solver,
+               beta_loss=beta_loss, max_iter=max_iter, tol=tol,
+               random_state=random_state)
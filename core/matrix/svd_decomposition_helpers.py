@@ -1,6 +1,28 @@
 import numpy as np
 import os
 import pandas as pd
+from scipy.sparse.linalg import svds
+
+
+def _permute_columns_inplace(M, perm):
+    """
+    Reorder the columns of M in place so that column j becomes
+    M[:, perm[j]], following the cycles of perm.
+    Only one column is held as a temporary.
+    """
+    visited = np.zeros(len(perm), dtype=bool)
+    for start in range(len(perm)):
+        if visited[start] or perm[start] == start:
+            visited[start] = True
+            continue
+        first_col = M[:, start].copy()
+        j = start
+        while perm[j] != start:
+            M[:, j] = M[:, perm[j]]
+            visited[j] = True
+            j = perm[j]
+        M[:, j] = first_col
+        visited[j] = True
 
 
 def fix_scipy_svds(U, sigmas, V_T):
@@ -8,22 +30,46 @@ def fix_scipy_svds(U, sigmas, V_T):
     scipy.sparse.linalg.svds orders the singular values in increasing order.
     This function flips this order.
 
+    No copy of U or V_T is made. When the singular values are ascending
+    (the svds case) the result is a zero-copy reversed view of the inputs,
+    which are left unchanged and stay in ascending order. Otherwise U,
+    sigmas and V_T are all permuted in place and the same arrays are
+    returned, now in decreasing order. Either way the caller's arrays stay
+    consistent with each other.
+
     Parameters
     ___________
     U, sigmas,V_T
 
     Returns
     -------
-    U_nwq, sigmas_new, V_T_new
+    U_new, sigmas_new, V_T_new
     ordered in decreasing singular values
     """
-    sv_reordering = np.argsort(-sigmas)
+    sv_reordering = np.argsort(-sigmas, kind='stable')
+
+    if np.array_equal(sigmas[::-1], sigmas[sv_reordering]):
+        return U[:, ::-1], sigmas[::-1], V_T[::-1, :]
 
-    U_new = U[:, sv_reordering]
-    sigmas_new = sigmas[sv_reordering]
-    V_T_new = np.fliplr(V_T)
+    _permute_columns_inplace(U, sv_reordering)
+    _permute_columns_inplace(V_T.T, sv_reordering)
+    sigmas[:] = sigmas[sv_reordering]
 
-    return U_new, sigmas_new, V_T_new 
+    return U, sigmas, V_T
+
+
+def descending_svds(input_matrix, k, **svds_kwargs):
+    """
+    Truncated SVD via scipy.sparse.linalg.svds with factors
+    in decreasing order of singular values
+
+    :param input_matrix: scipy.sparse matrix
+    :param k: (int) number of singular values
+    :param svds_kwargs: passed to scipy.sparse.linalg.svds
+    :return: U, sigmas, V_T
+    """
+    U, sigmas, V_T = svds(input_matrix, k=k, **svds_kwargs)
+    return fix_scipy_svds(U, sigmas, V_T)
 
 
 def serialize_SVD(U, sigmas, V_T, file_names):
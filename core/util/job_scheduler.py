@@ -0,0 +1,338 @@
+"""
+Resource aware scheduler for BLAS heavy decomposition and coherence jobs
+
+Jobs run in worker processes under a global core and memory budget.
+Each job gets a fixed number of BLAS/OpenMP threads (set with
+threadpoolctl inside its worker), and is only admitted once its
+estimated memory fits in what is left of the budget, so running jobs
+never oversubscribe the cores or the RAM.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from time import time
+import numpy as np
+import scipy.sparse as sp
+from threadpoolctl import threadpool_limits
+
+# estimates cover the factors plus the solver's temporaries of the same size
+NMF_WORKSPACE_FACTOR = 4
+SVD_WORKSPACE_FACTOR = 2
+# a token is a list slot plus a python str, a dictionary term sits in 4 dicts
+BYTES_PER_TOKEN = 64
+BYTES_PER_TERM = 400
+
+
+def _sparse_nbytes(shape, nnz, dtype):
+    """
+    Bytes held by a CSR matrix of this shape, nnz and dtype
+    """
+    return nnz * (np.dtype(dtype).itemsize + 4) + (shape[0] + 1) * 4
+
+
+def estimate_nmf_memory(shape, k, nnz=None, dtype=np.float64):
+    """
+    Estimated peak memory of fitting NMF on a matrix
+
+    :param shape: (tuple) shape of the input matrix
+    :param k: (int) number of components
+    :param nnz: (int) non zeros of the sparse input, None if dense
+    :param dtype: dtype of the input and factors
+    :return: (int) bytes
+    """
+    n, m = shape
+    itemsize = np.dtype(dtype).itemsize
+    input_bytes = n * m * itemsize if nnz is None else _sparse_nbytes(shape, nnz, dtype)
+    factor_bytes = (n * k + k * m) * itemsize
+    return int(2 * input_bytes + NMF_WORKSPACE_FACTOR * factor_bytes)
+
+
+def estimate_svd_memory(shape, k, nnz=None, dtype=np.float64):
+    """
+    Estimated peak memory of scipy.sparse.linalg.svds on a matrix,
+    including the Lanczos basis of ncv = max(2k + 1, 20) vectors
+
+    :param shape: (tuple) shape of the input matrix
+    :param k: (int) number of singular values
+    :param nnz: (int) non zeros of the sparse input, None if dense
+    :param dtype: dtype of the input and factors
+    :return: (int) bytes
+    """
+    n, m = shape
+    itemsize = np.dtype(dtype).itemsize
+    input_bytes = n * m * itemsize if nnz is None else _sparse_nbytes(shape, nnz, dtype)
+    ncv = min(min(n, m), max(2 * k + 1, 20))
+    factor_bytes = (n * k + k * m + ncv * min(n, m)) * itemsize
+    return int(input_bytes + SVD_WORKSPACE_FACTOR * factor_bytes)
+
+
+def estimate_coherence_memory(n_tokens, vocab_size, n_topics, top_n_words=15,
+                              processes=1):
+    """
+    Estimated peak memory of c_v coherence in a worker process
+
+    Counts the token lists sent to the worker (pickled buffer plus the
+    unpickled lists), the gensim Dictionary, and per gensim process the
+    co-occurrence counts of the topic words and the id windows.
+
+    :param n_tokens: (int) total number of tokens in the texts
+    :param vocab_size: (int) number of terms in the dictionary
+    :param n_topics: (int) number of topics
+    :param top_n_words: (int) terms per topic
+    :param processes: (int) gensim worker processes
+    :return: (int) bytes
+    """
+    text_bytes = 2 * n_tokens * BYTES_PER_TOKEN
+    dictionary_bytes = vocab_size * BYTES_PER_TERM
+    n_relevant = n_topics * top_n_words
+    accumulator_bytes = 8 * n_relevant ** 2 + 8 * n_tokens
+    return int(text_bytes + dictionary_bytes + processes * accumulator_bytes)
+
+
+def available_memory():
+    """
+    Physical memory of the machine in bytes (None if unknown)
+    """
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+class Job:
+    """
+    A function call to run under the scheduler
+
+    :param name: (str) unique job name
+    :param func: module level function (it is sent to a worker process)
+    :param args: tuple of positional arguments
+    :param kwargs: dict of keyword arguments
+    :param memory_bytes: (int) estimated peak memory, see estimate_*_memory
+    :param n_threads: (int) BLAS threads, None to let the scheduler decide
+    :param threads_kwarg: (str) if given, the assigned thread count is also
+                            passed to func under this keyword (e.g. for gensim
+                            'processes')
+    """
+
+    def __init__(self, name, func, args=(), kwargs=None, memory_bytes=0,
+                 n_threads=None, threads_kwarg=None):
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.kwargs = dict(kwargs or {})
+        self.memory_bytes = int(memory_bytes)
+        self.n_threads = n_threads
+        self.threads_kwarg = threads_kwarg
+
+
+def _matrix_stats(A):
+    """
+    shape, nnz (None if dense) and dtype of a matrix
+    """
+    return A.shape, (A.nnz if sp.issparse(A) else None), A.dtype
+
+
+def nmf_job(name, A, k, n_threads=None, **nmf_kwargs):
+    """
+    Job running core.matrix.nmf_decompositions.compute_nmf(k, A)
+    """
+    from core.matrix.nmf_decompositions import compute_nmf
+
+    shape, nnz, dtype = _matrix_stats(A)
+    return Job(name, compute_nmf, args=(k, A), kwargs=nmf_kwargs,
+               memory_bytes=estimate_nmf_memory(shape, k, nnz, dtype),
+               n_threads=n_threads)
+
+
+def svd_job(name, A, k, n_threads=None, **svds_kwargs):
+    """
+    Job running core.matrix.svd_decomposition_helpers.descending_svds(A, k)
+    """
+    from core.matrix.svd_decomposition_helpers import descending_svds
+
+    shape, nnz, dtype = _matrix_stats(A)
+    return Job(name, descending_svds, args=(A, k), kwargs=svds_kwargs,
+               memory_bytes=estimate_svd_memory(shape, k, nnz, dtype),
+               n_threads=n_threads)
+
+
+def coherence_job(name, training_data, topic_list, memory_bytes=None, n_threads=1):
+    """
+    Job computing c_v coherence of topic_list on training_data
+
+    Only the token lists and dictionary are sent to the worker, not the
+    whole TrainingData. gensim's worker processes are capped at the job's
+    thread count, memory_bytes defaults to estimate_coherence_memory
+    for n_threads processes (so n_threads is fixed, never left to the
+    scheduler).
+    """
+    from core.data.training_data import compute_c_v_coherence
+
+    n_threads = n_threads or 1
+    texts = training_data.input_data
+    dictionary = training_data.id2word
+    if memory_bytes is None:
+        memory_bytes = estimate_coherence_memory(sum(len(text) for text in texts),
+                                                 len(dictionary), len(topic_list),
+                                                 max(len(topic) for topic in topic_list),
+                                                 processes=n_threads)
+    return Job(name, compute_c_v_coherence, args=(topic_list, texts, dictionary),
+               memory_bytes=memory_bytes, n_threads=n_threads,
+               threads_kwarg='processes')
+
+
+def _run_job(func, args, kwargs, n_threads):
+    """
+    Worker entry point, runs func with BLAS/OpenMP pools capped at n_threads
+    """
+    with threadpool_limits(limits=n_threads):
+        return func(*args, **kwargs)
+
+
+class ResourceScheduler:
+    """
+    Runs a queue of Jobs under a global core and memory budget
+
+    Jobs are admitted in submission order, later jobs may start first if
+    the earlier ones do not fit yet. A job without n_threads gets an even
+    share of the free cores over the queued jobs that fit in the free
+    memory alongside it, so a job no other job can run next to gets
+    all free cores. utilization() can be polled from another thread while run()
+    is working.
+
+    :param max_cores: (int) cores to use, def = os.cpu_count()
+    :param max_memory_bytes: (int) memory budget, def = 80% of physical memory
+    """
+
+    def __init__(self, max_cores=None, max_memory_bytes=None):
+        self.max_cores = max_cores or os.cpu_count() or 1
+        if max_memory_bytes is None and available_memory() is not None:
+            max_memory_bytes = int(0.8 * available_memory())
+        self.max_memory_bytes = max_memory_bytes
+        self.queue = []
+        self.results = {}
+        self.report = []
+        self._lock = threading.Lock()
+        self._counters = {"cores_in_use": 0, "memory_in_use": 0,
+                          "jobs_running": 0, "jobs_queued": 0,
+                          "jobs_done": 0, "jobs_failed": 0,
+                          "peak_cores_in_use": 0, "peak_memory_in_use": 0}
+
+    def submit(self, job):
+        """
+        Add job to the queue
+
+        :param job: Job
+        """
+        if self.max_memory_bytes is not None and job.memory_bytes > self.max_memory_bytes:
+            raise ValueError(f"Job '{job.name}' needs ~{job.memory_bytes / 2 ** 30:.1f} GB, "
+                             f"more than the {self.max_memory_bytes / 2 ** 30:.1f} GB budget")
+        if job.n_threads is not None and job.n_threads > self.max_cores:
+            raise ValueError(f"Job '{job.name}' asks for {job.n_threads} threads, "
+                             f"more than the {self.max_cores} core budget")
+        if any(queued.name == job.name for queued in self.queue) or job.name in self.results:
+            raise ValueError(f"Duplicate job name '{job.name}'")
+        self.queue.append(job)
+        with self._lock:
+            self._counters["jobs_queued"] += 1
+
+    def utilization(self):
+        """
+        Snapshot of the live counters, including the fraction of the
+        core and memory budgets in use
+
+        :return: dict
+        """
+        with self._lock:
+            snapshot = dict(self._counters)
+        snapshot["core_utilization"] = snapshot["cores_in_use"] / self.max_cores
+        snapshot["memory_utilization"] = (snapshot["memory_in_use"] / self.max_memory_bytes
+                                          if self.max_memory_bytes else None)
+        return snapshot
+
+    def _update(self, cores, memory, running, queued):
+        with self._lock:
+            counters = self._counters
+            counters["cores_in_use"] += cores
+            counters["memory_in_use"] += memory
+            counters["jobs_running"] += running
+            counters["jobs_queued"] += queued
+            counters["peak_cores_in_use"] = max(counters["peak_cores_in_use"],
+                                                counters["cores_in_use"])
+            counters["peak_memory_in_use"] = max(counters["peak_memory_in_use"],
+                                                 counters["memory_in_use"])
+
+    def _next_admissible(self):
+        """
+        First queued job fitting in the free cores and memory,
+        with its assigned thread count
+        """
+        free_cores = self.max_cores - self._counters["cores_in_use"]
+        free_memory = (None if self.max_memory_bytes is None
+                       else self.max_memory_bytes - self._counters["memory_in_use"])
+        for job in self.queue:
+            if free_memory is not None and job.memory_bytes > free_memory:
+                continue
+            n_threads = job.n_threads or max(1, free_cores // self._co_admissible(job, free_memory))
+            if n_threads > free_cores:
+                continue
+            return job, n_threads
+        return None, None
+
+    def _co_admissible(self, job, free_memory):
+        """
+        Number of queued jobs, job included, that fit in free_memory
+        together (taken in queue order), i.e. that could run alongside it
+        """
+        if free_memory is None:
+            return len(self.queue)
+        remaining = free_memory - job.memory_bytes
+        count = 1
+        for other in self.queue:
+            if other is not job and other.memory_bytes <= remaining:
+                remaining -= other.memory_bytes
+                count += 1
+        return count
+
+    def run(self):
+        """
+        Run every queued job
+
+        :return: dict with key (str) job name, value the job's return value
+                    (failed jobs are left out, see self.report)
+        """
+        running = {}
+        with ProcessPoolExecutor(max_workers=self.max_cores) as executor:
+            while self.queue or running:
+                job, n_threads = self._next_admissible()
+                while job is not None:
+                    self.queue.remove(job)
+                    kwargs = dict(job.kwargs)
+                    if job.threads_kwarg:
+                        kwargs[job.threads_kwarg] = n_threads
+                    print(f"[{job.name}] starting with {n_threads} threads, "
+                          f"~{job.memory_bytes / 2 ** 20:.0f} MB")
+                    future = executor.submit(_run_job, job.func, job.args, kwargs, n_threads)
+                    running[future] = (job, n_threads, time())
+                    self._update(n_threads, job.memory_bytes, 1, -1)
+                    job, n_threads = self._next_admissible()
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, n_threads, t0 = running.pop(future)
+                    secs = time() - t0
+                    self._update(-n_threads, -job.memory_bytes, -1, 0)
+                    try:
+                        self.results[job.name] = future.result()
+                    except Exception as exc:
+                        print(f"[{job.name}] failed: {exc!r}")
+                        self.report.append([job.name, 'failed', n_threads, job.memory_bytes, secs])
+                        with self._lock:
+                            self._counters["jobs_failed"] += 1
+                        continue
+                    print(f"[{job.name}] done in {secs:.2f} secs")
+                    self.report.append([job.name, 'done', n_threads, job.memory_bytes, secs])
+                    with self._lock:
+                        self._counters["jobs_done"] += 1
+
+        return self.results
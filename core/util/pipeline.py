@@ -0,0 +1,297 @@
+"""
+Minimal file based pipeline runner
+
+A Stage reads input files and writes output files. The dependency graph
+is inferred from the paths: a stage depends on every stage that writes
+one of its inputs. A stage is skipped when the content hashes of its
+inputs, its parameters, its own source and the source files of the
+modules it declares in code_deps are unchanged since its last
+successful run and all its outputs exist. Code outside code_deps
+(e.g. installed packages) is not tracked, rerun with force after
+changing it. Independent stages run concurrently, each in a freshly
+spawned worker process, and report wall time and peak memory.
+"""
+import hashlib
+import importlib.util
+import inspect
+import json
+import multiprocessing
+import os
+import queue
+import sys
+from time import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+HASH_CHUNK_BYTES = 1 << 24
+
+
+class Stage:
+    """
+    One step of the pipeline
+
+    func is called as func(inputs, outputs, **params) where inputs and
+    outputs are dicts of name -> path. It must be a module level function
+    so it can be sent to a worker process. code_deps lists the modules
+    (dotted names) whose source the stage's result depends on.
+    """
+
+    def __init__(self, name, func, inputs, outputs, params=None, code_deps=()):
+        self.name = name
+        self.func = func
+        self.inputs = dict(inputs)
+        self.outputs = dict(outputs)
+        self.params = dict(params or {})
+        self.code_deps = tuple(code_deps)
+
+
+def module_source_path(module_name):
+    """
+    Path to the source file of a module, found without importing it
+    (so e.g. the spacy model in core.data.text.cleaning is not loaded)
+    """
+    spec = importlib.util.find_spec(module_name)
+    if spec is None or not spec.origin or not os.path.isfile(spec.origin):
+        raise ValueError(f"Cannot find the source of module '{module_name}'")
+    return spec.origin
+
+
+def _peak_memory_mb():
+    """
+    Peak resident memory of this process in MB (None if unknown)
+
+    On Linux the peak of the current address space (VmHWM) is used,
+    ru_maxrss keeps the parent's peak across the exec of a spawned worker.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 2 ** 10
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KB on Linux
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def _run_stage(func, inputs, outputs, params):
+    """
+    Worker entry point, returns (secs, peak memory in MB)
+    """
+    for path in outputs.values():
+        out_dir = os.path.dirname(path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+    t0 = time()
+    func(inputs, outputs, **params)
+    return time() - t0, _peak_memory_mb()
+
+
+class Pipeline:
+    """
+    Stage graph with content hash checkpointing
+
+    :param stages: list of Stage
+    :param state_path: path to the json file holding the checkpoint state
+    :param n_jobs: (int) maximum number of stages running at once
+    """
+
+    def __init__(self, stages, state_path, n_jobs=1):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_path = state_path
+        self.n_jobs = n_jobs
+        self.dependencies = self._infer_dependencies()
+        self._check_acyclic()
+        self.state = self._load_state()
+
+    def _infer_dependencies(self):
+        """
+        dict of stage name -> set of names of the stages writing its inputs
+        """
+        writers = {}
+        for stage in self.stages.values():
+            for path in stage.outputs.values():
+                if path in writers:
+                    raise ValueError(f"{path} is written by both "
+                                     f"'{writers[path]}' and '{stage.name}'")
+                writers[path] = stage.name
+
+        return {stage.name: {writers[path] for path in stage.inputs.values()
+                             if path in writers}
+                for stage in self.stages.values()}
+
+    def _check_acyclic(self):
+        """
+        Raise ValueError if the dependency graph has a cycle
+        """
+        done, visiting = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through stage '{name}'")
+            visiting.add(name)
+            for dep in self.dependencies[name]:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                return json.load(f)
+        return {"stages": {}, "files": {}}
+
+    def _save_state(self):
+        state_dir = os.path.dirname(self.state_path)
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def file_hash(self, path):
+        """
+        sha256 of the file contents, memoized on (size, mtime) so
+        large unchanged inputs are not re-read on every run
+        """
+        stat = os.stat(path)
+        cached = self.state["files"].get(path)
+        if cached and cached["size"] == stat.st_size and cached["mtime"] == stat.st_mtime:
+            return cached["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+                digest.update(chunk)
+        self.state["files"][path] = {"size": stat.st_size, "mtime": stat.st_mtime,
+                                     "sha256": digest.hexdigest()}
+        return digest.hexdigest()
+
+    def fingerprint(self, stage):
+        """
+        Hash of the stage's input contents, parameters, own source code
+        and the source files of its code_deps
+        """
+        try:
+            source = inspect.getsource(stage.func)
+        except (OSError, TypeError):
+            source = stage.func.__qualname__
+        payload = {
+            "inputs": {name: self.file_hash(path) for name, path in sorted(stage.inputs.items())},
+            "outputs": sorted(stage.outputs.values()),
+            "params": stage.params,
+            "code": hashlib.sha256(source.encode()).hexdigest(),
+            "code_deps": {name: self.file_hash(module_source_path(name))
+                          for name in sorted(stage.code_deps)},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str)
+                              .encode()).hexdigest()
+
+    def is_up_to_date(self, stage, fingerprint):
+        """
+        True if stage last succeeded with this fingerprint
+        and all its outputs still exist
+        """
+        record = self.state["stages"].get(stage.name)
+        return (record is not None
+                and record["fingerprint"] == fingerprint
+                and all(os.path.exists(path) for path in stage.outputs.values()))
+
+    def _required_stages(self, targets):
+        """
+        targets and all their ancestors
+        """
+        required = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in self.stages:
+                raise KeyError(f"Unknown stage '{name}'")
+            if name not in required:
+                required.add(name)
+                pending.extend(self.dependencies[name])
+        return required
+
+    def run(self, targets=None, force=()):
+        """
+        Run the stages needed for targets (default: every stage)
+
+        :param targets: iterable of stage names, def = all stages
+        :param force: iterable of stage names to rerun even if up to date
+        :return: list of [stage, status, secs, peak memory in MB]
+        """
+        required = self._required_stages(targets or self.stages)
+        force = set(force)
+        finished, running, fingerprints = set(), set(), {}
+        report, failures = [], []
+        done_queue = queue.Queue()
+
+        # spawned (not forked) workers start from a fresh interpreter, so their
+        # peak RSS is the stage's own and not the parent's footprint at fork
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(processes=self.n_jobs, maxtasksperchild=1) as pool:
+            while len(finished) < len(required):
+                ready = [name for name in sorted(required - finished - running)
+                         if self.dependencies[name] <= finished]
+
+                for name in ([] if failures else ready):
+                    stage = self.stages[name]
+                    missing = [path for path in stage.inputs.values() if not os.path.exists(path)]
+                    if missing:
+                        raise FileNotFoundError(f"Stage '{name}' is missing inputs {missing}")
+
+                    fingerprints[name] = self.fingerprint(stage)
+                    if name not in force and self.is_up_to_date(stage, fingerprints[name]):
+                        print(f"[{name}] up to date, skipping")
+                        report.append([name, 'skipped', 0.0, None])
+                        finished.add(name)
+                        continue
+
+                    print(f"[{name}] starting")
+                    running.add(name)
+                    pool.apply_async(_run_stage,
+                                     (stage.func, stage.inputs, stage.outputs, stage.params),
+                                     callback=lambda result, name=name: done_queue.put((name, result, None)),
+                                     error_callback=lambda exc, name=name: done_queue.put((name, None, exc)))
+
+                if not running:
+                    if failures:
+                        break
+                    continue
+
+                name, result, exc = done_queue.get()
+                running.discard(name)
+                if exc is not None:
+                    print(f"[{name}] failed: {exc!r}")
+                    report.append([name, 'failed', None, None])
+                    failures.append((name, exc))
+                    continue
+
+                secs, peak_mb = result
+                peak_str = f"{peak_mb:.0f} MB" if peak_mb is not None else "n/a"
+                print(f"[{name}] done in {secs:.2f} secs, peak memory {peak_str}")
+                report.append([name, 'ran', secs, peak_mb])
+                finished.add(name)
+                self.state["stages"][name] = {"fingerprint": fingerprints[name],
+                                              "secs": secs, "peak_mb": peak_mb}
+                for path in self.stages[name].outputs.values():
+                    self.file_hash(path)
+                self._save_state()
+
+        self._save_state()
+        if failures:
+            name, exc = failures[0]
+            raise RuntimeError(f"Stage '{name}' failed") from exc
+        return report
@@ -0,0 +1,178 @@
+r"""
+Run the full pipeline as a graph of stages:
+
+    filter -> clean -> tfidf -> nmf -> topics
+                            \-> svd
+
+Stages whose inputs, parameters and code (the stage function and the
+core modules listed in its code_deps) are unchanged since their last
+run are skipped, independent stages (nmf and svd) run concurrently.
+Run from the repository root, e.g.
+
+    python -m scripts.run_pipeline --nmf-k 15 --svd-k 500 --jobs 2
+    python -m scripts.run_pipeline --stages topics --coherence
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from core.util.pipeline import Pipeline, Stage
+
+# stages import their core modules lazily, so e.g. the spacy model
+# loaded by core.data.text.cleaning is only loaded by the clean stage
+
+
+def filter_stage(inputs, outputs, single_cat_only, single_spec_cat):
+    from core.data.arxiv_data_io import create_set_for_category_dict, CATEGORY_DICT
+    from core.util.basic_io import write_dict_to_json
+
+    data = create_set_for_category_dict(inputs["raw"], CATEGORY_DICT,
+                                        single_cat_only=single_cat_only,
+                                        single_spec_cat=single_spec_cat)
+    write_dict_to_json(outputs["subset"], data)
+
+
+def clean_stage(inputs, outputs):
+    from core.util.basic_io import read_json_to_dict
+    from core.data.arxiv_data_io import create_arxiv_df
+    from core.data.text.cleaning import clean, tokenize
+
+    data_df = create_arxiv_df(read_json_to_dict(inputs["subset"]))
+    data_df['clean'] = data_df['abstract'].apply(clean)
+    data_df['tokens'] = data_df['clean'].apply(tokenize)
+    data_df.to_pickle(outputs["tokenized"])
+
+
+def tfidf_stage(inputs, outputs):
+    from core.data.arxiv_data_io import sample_arxiv_data_by_category
+    from core.data.text.tf_idf_helpers import fit_transform_tfidf_with_counts
+    from core.util.basic_io import write_dict_to_json
+
+    train_df, _ = sample_arxiv_data_by_category(pd.read_pickle(inputs["tokenized"]))
+    count_matrix, tfidf_matrix, index_to_word, _ = fit_transform_tfidf_with_counts(train_df)
+
+    sp.save_npz(outputs["tfidf"], tfidf_matrix)
+    sp.save_npz(outputs["counts"], count_matrix)
+    write_dict_to_json(outputs["vocab"], index_to_word)
+    train_df[['id', 'full_df_index', 'tokens']].to_pickle(outputs["train"])
+
+
+def nmf_stage(inputs, outputs, k, init, solver):
+    from core.matrix.nmf_decompositions import compute_nmf
+
+    nmf_model, W, H = compute_nmf(k, sp.load_npz(inputs["tfidf"]),
+                                  init=init, solver=solver)
+    np.save(outputs["W"], W)
+    np.save(outputs["H"], H)
+
+
+def svd_stage(inputs, outputs, k):
+    from core.matrix.svd_decomposition_helpers import descending_svds
+
+    U, sigmas, V_T = descending_svds(sp.load_npz(inputs["tfidf"]), k)
+    np.save(outputs["U"], U)
+    np.save(outputs["sigmas"], sigmas)
+    np.save(outputs["V_T"], V_T)
+
+
+def topics_stage(inputs, outputs, top_n_words, coherence):
+    from core.matrix.nmf_decompositions import generate_topics_from_NMF
+    from core.util.basic_io import read_json_to_dict
+
+    index_to_word = {int(index): word for index, word
+                     in read_json_to_dict(inputs["vocab"]).items()}
+    topics_df = generate_topics_from_NMF(np.load(inputs["H"]), index_to_word,
+                                         top_n_words=top_n_words)
+    if coherence:
+        from gensim.models.coherencemodel import CoherenceModel
+        from core.data.text.bow_corpus import csr_dictionary
+
+        texts = pd.read_pickle(inputs["train"])['tokens'].tolist()
+        id2word = csr_dictionary(sp.load_npz(inputs["counts"]), index_to_word)
+        cm = CoherenceModel(topics=topics_df['Terms'].tolist(), texts=texts,
+                            dictionary=id2word, coherence='c_v')
+        topics_df['Coherence'] = cm.get_coherence_per_topic()
+    topics_df.to_csv(outputs["topics"], index=False)
+
+
+def build_stages(args):
+    """
+    Declare the pipeline stages from the command line arguments
+    """
+    res = args.resources_dir
+    out = args.output_dir
+    subset = os.path.join(out, "arxiv_subset.json")
+    tokenized = os.path.join(out, "tokenized_arxiv_subset.pkl")
+    tfidf = os.path.join(out, "tfidf_train.npz")
+    counts = os.path.join(out, "counts_train.npz")
+    vocab = os.path.join(out, "tfidf_index_to_word.json")
+    train = os.path.join(out, "train_tokens.pkl")
+    nmf_prefix = os.path.join(out, f"NMF_{args.nmf_k}k_{args.init}_{args.solver}")
+    svd_prefix = os.path.join(out, f"SVD_{args.svd_k}k")
+
+    return [
+        Stage("filter", filter_stage,
+              inputs={"raw": os.path.join(res, args.raw_file)},
+              outputs={"subset": subset},
+              params={"single_cat_only": True, "single_spec_cat": True},
+              code_deps=["core.data.arxiv_data_io", "core.util.basic_io"]),
+        Stage("clean", clean_stage,
+              inputs={"subset": subset},
+              outputs={"tokenized": tokenized},
+              code_deps=["core.data.arxiv_data_io", "core.data.text.cleaning",
+                         "core.util.basic_io"]),
+        Stage("tfidf", tfidf_stage,
+              inputs={"tokenized": tokenized},
+              outputs={"tfidf": tfidf, "counts": counts, "vocab": vocab, "train": train},
+              code_deps=["core.data.arxiv_data_io", "core.data.sampling",
+                         "core.data.text.tf_idf_helpers", "core.util.basic_io"]),
+        Stage("nmf", nmf_stage,
+              inputs={"tfidf": tfidf},
+              outputs={"W": f"{nmf_prefix}_W.npy", "H": f"{nmf_prefix}_H.npy"},
+              params={"k": args.nmf_k, "init": args.init, "solver": args.solver},
+              code_deps=["core.matrix.nmf_decompositions", "core.matrix.nmf_solvers"]),
+        Stage("svd", svd_stage,
+              inputs={"tfidf": tfidf},
+              outputs={"U": f"{svd_prefix}_U.npy", "sigmas": f"{svd_prefix}_sigmas.npy",
+                       "V_T": f"{svd_prefix}_V_T.npy"},
+              params={"k": args.svd_k},
+              code_deps=["core.matrix.svd_decomposition_helpers"]),
+        Stage("topics", topics_stage,
+              inputs={"H": f"{nmf_prefix}_H.npy", "vocab": vocab, "counts": counts,
+                      "train": train},
+              outputs={"topics": f"{nmf_prefix}_topics.csv"},
+              params={"top_n_words": args.top_n_words, "coherence": args.coherence},
+              code_deps=["core.matrix.nmf_decompositions", "core.data.text.bow_corpus",
+                         "core.util.basic_io"]),
+    ]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the arxiv matrix decomposition pipeline")
+    parser.add_argument("--resources-dir", default=os.path.join("core", "resources"))
+    parser.add_argument("--output-dir", default=os.path.join("scripts", "output"))
+    parser.add_argument("--raw-file", default="arxiv-metadata-oai-snapshot.json")
+    parser.add_argument("--nmf-k", type=int, default=15)
+    parser.add_argument("--init", default="nndsvd")
+    parser.add_argument("--solver", default="cd")
+    parser.add_argument("--svd-k", type=int, default=500)
+    parser.add_argument("--top-n-words", type=int, default=15)
+    parser.add_argument("--coherence", action="store_true",
+                        help="compute c_v coherence per topic (slow)")
+    parser.add_argument("--stages", nargs="*", default=None,
+                        help="target stages, their upstream stages run as needed")
+    parser.add_argument("--force", nargs="*", default=(),
+                        help="stages to rerun even if up to date")
+    parser.add_argument("--jobs", type=int, default=2,
+                        help="maximum number of stages running at once")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    pipeline = Pipeline(build_stages(args),
+                        state_path=os.path.join(args.output_dir, "pipeline_state.json"),
+                        n_jobs=args.jobs)
+    report = pipeline.run(targets=args.stages, force=args.force)
+    print(pd.DataFrame(report, columns=['Stage', 'Status', 'Time (secs)', 'Peak memory (MB)']))
@@ -0,0 +1,29 @@
+from core.util.job_scheduler import Job, ResourceScheduler
+
+
+def _identity(x):
+    return x
+
+
+def _assigned_threads(scheduler):
+    return {entry[0]: entry[2] for entry in scheduler.report}
+
+
+def test_memory_bound_jobs_get_all_cores():
+    scheduler = ResourceScheduler(max_cores=8, max_memory_bytes=100)
+    for i in range(4):
+        scheduler.submit(Job(f'job{i}', _identity, (i,), memory_bytes=80))
+
+    assert scheduler.run() == {f'job{i}': i for i in range(4)}
+    assert set(_assigned_threads(scheduler).values()) == {8}
+
+
+def test_cores_shared_over_jobs_fitting_together():
+    scheduler = ResourceScheduler(max_cores=8, max_memory_bytes=100)
+    for i in range(3):
+        scheduler.submit(Job(f'job{i}', _identity, (i,), memory_bytes=30))
+
+    scheduler.run()
+    assert sum(_assigned_threads(scheduler).values()) == 8
+    assert scheduler.utilization()["peak_cores_in_use"] == 8
+    assert scheduler.utilization()["peak_memory_in_use"] == 90
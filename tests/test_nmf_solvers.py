@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from sklearn.decomposition import NMF
+from sklearn.decomposition._nmf import _initialize_nmf
+from core.matrix.nmf_solvers import (initialize_nmf, frobenius_error, HALSNMF,
+                                     NMFInitCache)
+
+SEEDS = range(5)
+
+
+def _random_sparse(seed, n=60, m=40, density=0.2):
+    return sp.random(n, m, density=density, format='csr', random_state=seed)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("init", ['nndsvd', 'nndsvda'])
+def test_initialize_matches_sklearn(seed, init):
+    A = _random_sparse(seed)
+    k = 5
+
+    W, H = initialize_nmf(A, k, init=init, random_state=seed)
+
+    W_sk, H_sk = _initialize_nmf(A, k, init=init, random_state=seed)
+    np.testing.assert_allclose(W, W_sk)
+    np.testing.assert_allclose(H, H_sk)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_hals_reaches_cd_error(seed):
+    A = _random_sparse(seed)
+    k = 5
+    W0, H0 = initialize_nmf(A, k, random_state=seed)
+
+    cd = NMF(n_components=k, init='custom', solver='cd', max_iter=1000, tol=1e-4)
+    cd.fit_transform(A, W=W0.copy(), H=H0.copy())
+    hals = HALSNMF(n_components=k, max_iter=1000, tol=1e-4)
+    W = hals.fit_transform(A, W=W0, H=H0)
+
+    assert hals.reconstruction_err_ <= cd.reconstruction_err_ * 1.01
+    assert np.all(W >= 0) and np.all(hals.components_ >= 0)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_frobenius_error(seed):
+    rng = np.random.RandomState(seed)
+    A = _random_sparse(seed)
+    W = rng.uniform(size=(A.shape[0], 4))
+    H = rng.uniform(size=(4, A.shape[1]))
+
+    expected = np.linalg.norm(A.toarray() - W @ H)
+    np.testing.assert_allclose(frobenius_error(A, W, H), expected)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_cached_svd_reuses_leading_columns(seed):
+    A = _random_sparse(seed)
+    cache = NMFInitCache(random_state=seed)
+    U, sigmas, V_T = cache.get_svd(A, 8)
+    U, sigmas, V_T = U.copy(), sigmas.copy(), V_T.copy()
+
+    U_small, sigmas_small, V_T_small = cache.get_svd(A, 3)
+
+    assert np.shares_memory(U_small, cache.U) and np.shares_memory(V_T_small, cache.V_T)
+    np.testing.assert_array_equal(U_small, U[:, :3])
+    np.testing.assert_array_equal(sigmas_small, sigmas[:3])
+    np.testing.assert_array_equal(V_T_small, V_T[:3, :])
+    W, H = initialize_nmf(A, 3, init='cached', init_cache=cache)
+    assert W.shape == (A.shape[0], 3) and H.shape == (3, A.shape[1])
+
+    with pytest.raises(ValueError):
+        cache.get_svd(A.T, 3)
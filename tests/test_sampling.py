@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from core.data.sampling import (stratified_sample_order, nested_stratified_samples,
+                                nested_sample_sizes, csr_prefix_view,
+                                nested_csr_samples, reservoir_sample)
+
+SEEDS = range(5)
+FRACTIONS = (0.01, 0.05, 0.2, 0.5)
+
+
+def _root(array):
+    # shares_memory is False for empty slices, so compare the owning arrays
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+def _random_labels(rng, n=5000):
+    return rng.choice(['cs', 'math', 'physics', 'q-bio', 'stat'], size=n,
+                      p=[0.4, 0.25, 0.2, 0.1, 0.05])
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_order_is_a_permutation(seed):
+    labels = _random_labels(np.random.RandomState(seed))
+
+    order = stratified_sample_order(labels, seed=seed)
+
+    np.testing.assert_array_equal(np.sort(order), np.arange(len(labels)))
+    np.testing.assert_array_equal(order, stratified_sample_order(labels, seed=seed))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_samples_are_nested_and_stratified(seed):
+    labels = _random_labels(np.random.RandomState(seed))
+    strata, counts = np.unique(labels, return_counts=True)
+
+    samples = nested_stratified_samples(labels, fractions=FRACTIONS, seed=seed)
+
+    sizes = sorted(samples.items())
+    for (_, smaller), (_, larger) in zip(sizes, sizes[1:]):
+        np.testing.assert_array_equal(larger[:len(smaller)], smaller)
+    for positions in samples.values():
+        sample_counts = np.array([np.sum(labels[positions] == s) for s in strata])
+        # each stratum is within a couple of rows of its proportional share
+        assert np.all(np.abs(sample_counts - len(positions) * counts / len(labels)) <= 2)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_csr_prefix_view(seed):
+    A = sp.random(200, 50, density=0.1, format='csr', random_state=seed)
+    for n_rows in [0, 1, 37, 200]:
+        view = csr_prefix_view(A, n_rows)
+
+        assert view.shape == (n_rows, A.shape[1])
+        assert _root(view.data) is _root(A.data)
+        assert _root(view.indices) is _root(A.indices)
+        assert (view != A[:n_rows]).nnz == 0
+
+    with pytest.raises(TypeError):
+        csr_prefix_view(A.tocsc(), 10)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_nested_csr_samples(seed):
+    rng = np.random.RandomState(seed)
+    labels = _random_labels(rng, n=500)
+    A = sp.random(500, 30, density=0.1, format='csr', random_state=seed)
+
+    ordered, order, samples = nested_csr_samples(A, labels, fractions=FRACTIONS, seed=seed)
+
+    assert (ordered != A[order]).nnz == 0
+    for frac, size in nested_sample_sizes(A.shape[0], FRACTIONS).items():
+        assert _root(samples[frac].data) is _root(ordered.data)
+        assert (samples[frac] != A[order[:size]]).nnz == 0
+
+
+def test_reservoir_inclusion_is_uniform():
+    n, sample_size, n_seeds = 50, 10, 4000
+    inclusions = np.zeros(n)
+    for seed in range(n_seeds):
+        sample = reservoir_sample(iter(range(n)), sample_size, seed=seed)
+        assert len(sample) == sample_size
+        assert all(position == item for position, item in sample)
+        assert [position for position, _ in sample] == sorted({p for p, _ in sample})
+        inclusions[[position for position, _ in sample]] += 1
+
+    frequencies = inclusions / n_seeds
+    # binomial standard error of the inclusion rate is about 0.006
+    np.testing.assert_allclose(frequencies, sample_size / n, atol=0.03)
+
+
+@pytest.mark.parametrize("sample_size", [5, 10])
+def test_reservoir_short_stream_comes_back_whole(sample_size):
+    stream = ['a', 'b', 'c', 'd', 'e']
+
+    sample = reservoir_sample(iter(stream), sample_size)
+
+    assert sample == list(enumerate(stream))
+    assert reservoir_sample(iter(stream), 0) == []
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from core.matrix.svd_decomposition_helpers import fix_scipy_svds, descending_svds
+
+SEEDS = range(20)
+
+
+def _random_factors(rng, n=30, m=20, k=8, order='C'):
+    U = np.array(rng.standard_normal((n, k)), order=order)
+    sigmas = rng.uniform(0.1, 5, size=k)
+    V_T = rng.standard_normal((k, m))
+    return U, sigmas, V_T
+
+
+def _check_reordered(U, sigmas, V_T, expected):
+    assert np.all(np.diff(sigmas) <= 0)
+    np.testing.assert_allclose((U * sigmas) @ V_T, expected)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_ascending_returns_reversed_views(seed):
+    rng = np.random.RandomState(seed)
+    U, sigmas, V_T = _random_factors(rng)
+    sigmas.sort()
+    U_in, sigmas_in, V_T_in = U.copy(), sigmas.copy(), V_T.copy()
+    expected = (U * sigmas) @ V_T
+
+    U_new, sigmas_new, V_T_new = fix_scipy_svds(U, sigmas, V_T)
+
+    _check_reordered(U_new, sigmas_new, V_T_new, expected)
+    assert np.shares_memory(U_new, U) and np.shares_memory(V_T_new, V_T)
+    assert np.shares_memory(sigmas_new, sigmas)
+    # inputs are untouched
+    np.testing.assert_array_equal(U, U_in)
+    np.testing.assert_array_equal(sigmas, sigmas_in)
+    np.testing.assert_array_equal(V_T, V_T_in)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("order", ['C', 'F'])
+@pytest.mark.parametrize("ties", [False, True])
+def test_arbitrary_order_permutes_inputs_in_place(seed, order, ties):
+    rng = np.random.RandomState(seed)
+    U, sigmas, V_T = _random_factors(rng, order=order)
+    if ties:
+        sigmas[rng.choice(len(sigmas), 3, replace=False)] = sigmas[0]
+    expected = (U * sigmas) @ V_T
+
+    U_new, sigmas_new, V_T_new = fix_scipy_svds(U, sigmas, V_T)
+
+    _check_reordered(U_new, sigmas_new, V_T_new, expected)
+    assert U_new is U and sigmas_new is sigmas and V_T_new is V_T
+    # the caller's tuple stays consistent
+    _check_reordered(U, sigmas, V_T, expected)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_descending_svds_reconstruction(seed):
+    A = sp.random(60, 40, density=0.2, format='csr', random_state=seed)
+    k = 6
+    v0 = np.random.RandomState(seed).rand(min(A.shape))
+    U, sigmas, V_T = descending_svds(A, k, v0=v0)
+
+    assert np.all(np.diff(sigmas) <= 0)
+    U_asc, sigmas_asc, V_T_asc = sp.linalg.svds(A, k=k, v0=v0)
+    np.testing.assert_allclose((U * sigmas) @ V_T, (U_asc * sigmas_asc) @ V_T_asc)
+    np.testing.assert_allclose(sigmas, np.sort(sigmas_asc)[::-1])